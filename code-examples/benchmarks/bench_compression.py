@@ -0,0 +1,125 @@
+"""
+RESPONSE COMPRESSION - CPU VS BYTES
+What CompressionMiddleware costs and saves for real response bodies
+
+Payloads are taken from both apps (no compression):
+- todo list:    GET /api/todos?limit=N, random titles and descriptions
+- ml batch:     POST /predict/batch with N random iris samples
+
+Each one is compressed at several zlib levels. Reported: compression time,
+compressed size, and the time the bytes take on a slow link
+(--link-mbps). "saved_ms" is transfer time saved minus CPU time spent, so
+a positive value means the client gets the response sooner.
+
+Run it:
+    python code-examples/benchmarks/bench_compression.py --levels 1 6 9 --link-mbps 1
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+import zlib
+
+from common import ASGIClient, load_example, print_table
+
+WORDS = ["buy", "milk", "call", "mom", "write", "report", "fix", "bike", "book", "flights", "pay", "rent",
+         "clean", "kitchen", "review", "pull", "request", "water", "plants", "plan", "trip", "email", "bank"]
+
+
+async def todo_payloads(sizes, rng) -> list:
+    todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+    client = ASGIClient(todo_api.app)
+    response = await client.post("/api/auth/register", {
+        "username": "bench", "email": "bench@example.com", "password": "benchmark"
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    operations = [
+        {"op": "create", "title": " ".join(rng.choices(WORDS, k=3)), "description": " ".join(rng.choices(WORDS, k=8))}
+        for _ in range(max(sizes))
+    ]
+    for start in range(0, len(operations), 1000):
+        await client.post("/api/todos/batch", {"operations": operations[start:start + 1000]}, headers=headers)
+
+    payloads = []
+    for size in sizes:
+        response = await client.get(f"/api/todos?limit={size}", headers=headers)
+        payloads.append((f"todo list x{size}", response.body))
+    return payloads
+
+
+async def ml_payloads(sizes, rng) -> list:
+    ml_api = load_example("phase6-ml/02_ml_web_integration.py", "ml_api")
+    client = ASGIClient(ml_api.app)
+    payloads = []
+    for size in sizes:
+        samples = [
+            {
+                "sepal_length": round(rng.uniform(4.3, 7.9), 1), "sepal_width": round(rng.uniform(2.0, 4.4), 1),
+                "petal_length": round(rng.uniform(1.0, 6.9), 1), "petal_width": round(rng.uniform(0.1, 2.5), 1)
+            }
+            for _ in range(size)
+        ]
+        response = await client.post("/predict/batch", {"samples": samples})
+        payloads.append((f"ml batch x{size}", response.body))
+    return payloads
+
+
+def measure(name, body, level, link_mbps, repeat) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # gzip, as the middleware does
+        compressed = compressor.compress(body) + compressor.flush()
+        times.append(time.perf_counter() - start)
+    cpu_us = sorted(times)[len(times) // 2] * 1e6
+    bytes_per_ms = link_mbps * 1e6 / 8 / 1000
+    plain_ms = len(body) / bytes_per_ms
+    sent_ms = len(compressed) / bytes_per_ms
+    return {
+        "payload": name,
+        "level": level,
+        "bytes": len(body),
+        "gzip_bytes": len(compressed),
+        "ratio": len(body) / len(compressed),
+        "cpu_us": cpu_us,
+        "link_ms": sent_ms,
+        "saved_ms": plain_ms - sent_ms - cpu_us / 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todo-sizes", type=int, nargs="+", default=[10, 100, 1000], help="todos per list")
+    parser.add_argument("--ml-sizes", type=int, nargs="+", default=[10, 100], help="samples per batch")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 6, 9], help="zlib compression levels")
+    parser.add_argument("--link-mbps", type=float, default=1.0, help="client bandwidth in Mbit/s")
+    parser.add_argument("--repeat", type=int, default=200, help="compressions per measurement")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+    # The ML example writes its model files to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench-"))
+    # Capture the bodies as the apps send them without compression
+    os.environ["COMPRESSION"] = "0"
+
+    rng = random.Random(42)
+    payloads = await todo_payloads(args.todo_sizes, rng) + await ml_payloads(args.ml_sizes, rng)
+    rows = [
+        measure(name, body, level, args.link_mbps, args.repeat)
+        for name, body in payloads
+        for level in args.levels
+    ]
+    print_table(
+        f"gzip per response, {args.link_mbps:g} Mbit/s link (uncompressed link time = bytes / bandwidth)",
+        rows,
+        ["payload", "level", "bytes", "gzip_bytes", "ratio", "cpu_us", "link_ms", "saved_ms"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+METRICS MIDDLEWARE OVERHEAD
+Per-request cost of MetricsMiddleware in both example APIs
+
+- bare:  the middleware wrapped around a no-op ASGI app (its own cost only)
+- app:   a cheap route through the full app, with and without the middleware
+
+Runs alternate between the two app builds so CPU frequency drift hits
+both equally.
+
+Run it:
+    python code-examples/benchmarks/bench_metrics_overhead.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from common import ASGIClient, load_example, print_table, summarize
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def time_requests(client, url, count) -> list:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await client.get(url)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def without_metrics(api):
+    """Rebuild the app's middleware stack with MetricsMiddleware left out"""
+    api.app.user_middleware = [m for m in api.app.user_middleware if m.cls is not api.MetricsMiddleware]
+    api.app.middleware_stack = None
+
+
+def with_metrics(api, saved):
+    api.app.user_middleware = saved
+    api.app.middleware_stack = None
+
+
+async def measure_app(name, api, url, requests, rounds) -> list:
+    client = ASGIClient(api.app)
+    saved = list(api.app.user_middleware)
+    plain, instrumented = [], []
+    await time_requests(client, url, 200)  # warm up
+
+    for _ in range(rounds):
+        without_metrics(api)
+        plain += await time_requests(client, url, requests // rounds)
+        with_metrics(api, saved)
+        instrumented += await time_requests(client, url, requests // rounds)
+
+    rows = []
+    for label, latencies in (("off", plain), ("on", instrumented)):
+        rows.append({"case": f"{name} GET {url}", "metrics": label, **summarize(latencies, sum(latencies))})
+    rows[1]["overhead_us"] = rows[1]["p50_us"] - rows[0]["p50_us"]
+    return rows
+
+
+async def measure_bare(api, requests) -> list:
+    plain = await time_requests(ASGIClient(noop_app), "/", requests)
+    wrapped = await time_requests(ASGIClient(api.MetricsMiddleware(noop_app, api.RequestMetrics())), "/", requests)
+    rows = [
+        {"case": "no-op ASGI app", "metrics": "off", **summarize(plain, sum(plain))},
+        {"case": "no-op ASGI app", "metrics": "on", **summarize(wrapped, sum(wrapped))},
+    ]
+    rows[1]["overhead_us"] = rows[1]["p50_us"] - rows[0]["p50_us"]
+    return rows
+
+
+async def run(args) -> list:
+    todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+    ml_api = load_example("phase6-ml/02_ml_web_integration.py", "ml_api")
+
+    rows = await measure_bare(todo_api, args.requests)
+    rows += await measure_app("todo", todo_api, "/", args.requests, args.rounds)
+    rows += await measure_app("ml", ml_api, "/model/info", args.requests, args.rounds)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="requests per case")
+    parser.add_argument("--rounds", type=int, default=10, help="alternations between off and on")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+    # The ML example writes its model files to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench-"))
+
+    rows = asyncio.run(run(args))
+    print_table(
+        "MetricsMiddleware overhead (latency in microseconds)",
+        rows,
+        ["case", "metrics", "ops", "mean_us", "p50_us", "p99_us", "overhead_us"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+ML API - BATCH PREDICTION BENCHMARK
+Row-by-row model calls vs one vectorized pass, and /predict/batch by size
+
+- model, loop:        scaler.transform + predict + predict_proba per row
+                      (what /predict/batch used to do)
+- model, vectorized:  one transform + one predict_proba for all rows
+- endpoint:           POST /predict/batch through the app, which also
+                      validates every sample and serializes every result
+
+Run it:
+    python code-examples/benchmarks/bench_ml_batch.py --sizes 1 10 100 1000 5000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from common import ASGIClient, load_example, print_table
+
+FEATURES = ("sepal_length", "sepal_width", "petal_length", "petal_width")
+
+
+def time_call(call, repeat) -> float:
+    """Median seconds per call"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def loop(ml_api, features):
+    for row in features:
+        scaled = ml_api.scaler.transform(row.reshape(1, -1))
+        ml_api.model.predict(scaled)
+        ml_api.model.predict_proba(scaled)
+
+
+async def time_request(client, body, repeat) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.post("/predict/batch", body)
+        times.append(time.perf_counter() - start)
+        assert response.status == 200, response.status
+    return sorted(times)[len(times) // 2]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 5000], help="samples per batch")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median)")
+    parser.add_argument("--max-loop", type=int, default=1000, help="largest batch timed row by row")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+    # The ML example writes its model files to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench-"))
+    os.environ["ML_MAX_BATCH_SIZE"] = str(max(args.sizes))
+    ml_api = load_example("phase6-ml/02_ml_web_integration.py", "ml_api")
+    client = ASGIClient(ml_api.app)
+
+    rng = random.Random(42)
+    rows = []
+    for size in args.sizes:
+        samples = [{name: round(rng.uniform(0.1, 7.9), 1) for name in FEATURES} for _ in range(size)]
+        features = np.array([[s[name] for name in FEATURES] for s in samples])
+
+        if size <= args.max_loop:
+            seconds = time_call(lambda: loop(ml_api, features), max(1, args.repeat // 2))
+            rows.append({"path": "model, loop", "samples": size, "ms": seconds * 1000, "us_per_sample": seconds * 1e6 / size})
+        seconds = time_call(lambda: ml_api.make_predictions(features), args.repeat)
+        rows.append({"path": "model, vectorized", "samples": size, "ms": seconds * 1000, "us_per_sample": seconds * 1e6 / size})
+        seconds = await time_request(client, {"samples": samples}, args.repeat)
+        rows.append({"path": "endpoint", "samples": size, "ms": seconds * 1000, "us_per_sample": seconds * 1e6 / size})
+
+    print_table(
+        "Batch prediction (median)",
+        rows,
+        ["path", "samples", "ms", "us_per_sample"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+ML API - COMPILED FOREST BENCHMARK
+scaler.transform + model.predict_proba vs CompiledForest.predict_proba
+
+Both are timed on the same random batches, for several batch sizes
+(median of --repeat calls). Before timing, the two results must be
+exactly equal (not just close). "speedup" is sklearn time / compiled
+time. The app only uses the compiled forest up to ML_COMPILED_MAX_ROWS
+(1024) rows, since sklearn is faster for large batches.
+
+Run it:
+    python code-examples/benchmarks/bench_ml_compiled_forest.py --sizes 1 16 256 4096
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import load_example, print_table
+
+
+def time_call(call, repeat) -> float:
+    """Median seconds per call"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 16, 256, 4096], help="rows per batch")
+    parser.add_argument("--repeat", type=int, default=50, help="calls per measurement (median)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # The ML example writes its model files to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench-"))
+    ml_api = load_example("phase6-ml/02_ml_web_integration.py", "ml_api")
+    forest = ml_api.CompiledForest(ml_api.model, ml_api.scaler)
+
+    def sklearn_proba(features):
+        return ml_api.model.predict_proba(ml_api.scaler.transform(features))
+
+    rng = np.random.default_rng(42)
+    rows = []
+    for size in args.sizes:
+        # Same 0.1 cm steps as real measurements, across the whole valid range
+        features = rng.uniform(0.1, 7.9, (size, 4)).round(1)
+        if not np.array_equal(sklearn_proba(features), forest.predict_proba(features)):
+            raise AssertionError(f"compiled probabilities differ for {size} rows")
+
+        sklearn_s = time_call(lambda: sklearn_proba(features), args.repeat)
+        compiled_s = time_call(lambda: forest.predict_proba(features), args.repeat)
+        rows.append({
+            "rows": size,
+            "sklearn_us": sklearn_s * 1e6,
+            "compiled_us": compiled_s * 1e6,
+            "speedup": sklearn_s / compiled_s,
+        })
+
+    print_table(
+        f"predict_proba, {len(ml_api.model.estimators_)} trees (median, identical results)",
+        rows,
+        ["rows", "sklearn_us", "compiled_us", "speedup"],
+    )
+
+
+if __name__ == "__main__":
+    main()
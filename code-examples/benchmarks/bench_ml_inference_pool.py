@@ -0,0 +1,179 @@
+"""
+ML API - INFERENCE POOL BENCHMARK
+Single predictions and health checks while large batches are running
+
+For each ML_INFERENCE_POOL setting a real uvicorn server is started and
+driven over HTTP, for a fixed time, by:
+- batch clients:   POST /predict/batch with --batch-size samples each
+- single clients:  POST /predict, one sample each
+- a health probe:  GET /health every 50 ms, as a load balancer would
+
+"inline" runs the model on the event loop (as before), so every batch
+holds up the singles and the probe queued behind it. "thread" and
+"process" move inference to a pool: the singles still wait for the event
+loop while a batch is validated and serialized, but no longer while it is
+predicted. rejected counts 503s (pool full); other non-2xx are errors.
+
+The load generator runs on the same machine: with few CPUs it competes
+with the server, so compare the pools, not the absolute numbers.
+
+Run it:
+    python code-examples/benchmarks/bench_ml_inference_pool.py --pools inline thread process --seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from common import print_table, summarize
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "phase6-ml")
+FEATURES = ("sepal_length", "sepal_width", "petal_length", "petal_width")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(pool: str, workers: int, model_dir: str, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        ML_INFERENCE_POOL=pool,
+        ML_INFERENCE_WORKERS=str(workers),
+        ML_PREDICTION_CACHE_SIZE="0",  # singles repeat; they must reach the model
+        COMPRESSION="0",
+    )
+    # The model files are written to (and loaded from) the working directory
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "02_ml_web_integration:app", "--app-dir", APP_DIR,
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=model_dir, env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def drive(base_url: str, args) -> dict:
+    rng = random.Random(42)
+
+    def sample():
+        return {name: round(rng.uniform(0.1, 7.9), 1) for name in FEATURES}
+
+    batch_body = json.dumps({"samples": [sample() for _ in range(args.batch_size)]}).encode()
+    singles = [sample() for _ in range(1000)]
+    headers = {"Content-Type": "application/json"}
+
+    connections = args.batch_clients + args.single_clients + 1
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        latencies = {"single": [], "health": [], "batch": []}
+        counts = {"rejected": 0, "errors": 0}
+        deadline = time.perf_counter() + args.seconds
+
+        async def timed(kind, request):
+            start = time.perf_counter()
+            response = await request()
+            if response.status_code == 503:
+                counts["rejected"] += 1
+            elif response.status_code >= 300:
+                counts["errors"] += 1
+            else:
+                latencies[kind].append(time.perf_counter() - start)
+
+        async def batch_client():
+            while time.perf_counter() < deadline:
+                await timed("batch", lambda: client.post("/predict/batch", content=batch_body, headers=headers))
+
+        async def single_client(offset):
+            i = offset
+            while time.perf_counter() < deadline:
+                body = singles[i % len(singles)]
+                await timed("single", lambda: client.post("/predict", json=body))
+                i += 1
+
+        async def health_probe():
+            while time.perf_counter() < deadline:
+                await timed("health", lambda: client.get("/health"))
+                await asyncio.sleep(0.05)
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(batch_client() for _ in range(args.batch_clients)),
+            *(single_client(n * 100) for n in range(args.single_clients)),
+            health_probe(),
+        )
+        elapsed = time.perf_counter() - started
+
+    single = summarize(latencies["single"], elapsed)
+    health = summarize(latencies["health"], elapsed)
+    batch = summarize(latencies["batch"], elapsed)
+    return {
+        "single_per_sec": single["ops_per_sec"],
+        "single_p50_us": single["p50_us"],
+        "single_p99_us": single["p99_us"],
+        "health_p99_us": health["p99_us"],
+        "batches_per_sec": batch["ops_per_sec"],
+        **counts,
+    }
+
+
+async def bench(pool: str, args) -> dict:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(pool, args.workers, tmp, port)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                await wait_ready(client, server)
+            result = await drive(base_url, args)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return {"pool": pool, **result}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pools", nargs="+", default=["inline", "thread", "process"], help="ML_INFERENCE_POOL values")
+    parser.add_argument("--workers", type=int, default=2, help="ML_INFERENCE_WORKERS")
+    parser.add_argument("--batch-clients", type=int, default=2, help="clients sending batches")
+    parser.add_argument("--batch-size", type=int, default=5000, help="samples per batch")
+    parser.add_argument("--single-clients", type=int, default=16, help="clients sending single predictions")
+    parser.add_argument("--seconds", type=float, default=10.0, help="measurement time per pool")
+    args = parser.parse_args()
+
+    rows = [await bench(pool, args) for pool in args.pools]
+    print_table(
+        f"{args.batch_clients} x {args.batch_size}-sample batches + {args.single_clients} single clients, "
+        f"{os.cpu_count()} CPUs (latency in microseconds)",
+        rows,
+        ["pool", "single_per_sec", "single_p50_us", "single_p99_us", "health_p99_us", "batches_per_sec",
+         "rejected", "errors"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
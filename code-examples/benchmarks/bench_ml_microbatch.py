@@ -0,0 +1,93 @@
+"""
+ML API - MICRO-BATCHING BENCHMARK
+Throughput and latency of POST /predict for several MicroBatcher settings
+
+`--clients` concurrent clients each send their next single-sample request
+as soon as the previous one was answered (closed loop). Every setting is
+max_batch_size:max_wait_ms; "1:0" is no batching (one model pass per
+request, as before). Reported per setting: requests per second, latency
+percentiles and the average batch the model actually saw.
+
+Requests go straight to the app (no sockets). Predictions run on the
+inference pool (ML_INFERENCE_POOL), so without batching they queue there:
+by Little's law, latency is about clients / ops_per_sec.
+
+Run it:
+    python code-examples/benchmarks/bench_ml_microbatch.py --clients 1 64 --settings 1:0 16:1 64:2 64:5 256:5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+from common import ASGIClient, load_example, print_table, summarize
+
+FEATURES = ("sepal_length", "sepal_width", "petal_length", "petal_width")
+
+
+async def run_clients(client, samples, clients, requests) -> dict:
+    latencies = []
+    pending = iter(range(requests))
+
+    async def one_client(offset):
+        for i in pending:
+            start = time.perf_counter()
+            response = await client.post("/predict", samples[(i + offset) % len(samples)])
+            latencies.append(time.perf_counter() - start)
+            assert response.status == 200, response.status
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_client(n) for n in range(clients)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", nargs="+", default=["1:0", "16:1", "64:2", "64:5", "256:5"],
+                        help="max_batch_size:max_wait_ms pairs")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 64], help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per measurement")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+    # The ML example writes its model files to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench-"))
+    # Unbatched, every client has a prediction queued on the inference pool
+    os.environ["ML_INFERENCE_MAX_QUEUE"] = str(max(args.clients))
+    # Samples repeat; cache hits would never reach the batcher
+    os.environ["ML_PREDICTION_CACHE_SIZE"] = "0"
+    ml_api = load_example("phase6-ml/02_ml_web_integration.py", "ml_api")
+    client = ASGIClient(ml_api.app)
+
+    rng = random.Random(42)
+    samples = [{name: round(rng.uniform(0.1, 7.9), 1) for name in FEATURES} for _ in range(1000)]
+
+    rows = []
+    for clients in args.clients:
+        for setting in args.settings:
+            size, wait = setting.split(":")
+            batcher = ml_api.micro_batcher = ml_api.MicroBatcher(int(size), float(wait))
+            # A lone client with batching off is slow; don't spend minutes on it
+            requests = args.requests if clients > 1 or size != "1" else min(args.requests, 500)
+            result = await run_clients(client, samples, clients, requests)
+            rows.append({
+                "clients": clients,
+                "batch:wait_ms": setting,
+                **result,
+                "avg_batch": batcher.metrics()["avg_batch_size"],
+            })
+
+    print_table(
+        "POST /predict (latency in microseconds)",
+        rows,
+        ["clients", "batch:wait_ms", "ops_per_sec", "p50_us", "p95_us", "p99_us", "avg_batch"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
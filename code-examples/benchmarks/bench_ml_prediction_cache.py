@@ -0,0 +1,89 @@
+"""
+ML API - PREDICTION CACHE BENCHMARK
+POST /predict with repeated measurements, cache off vs on
+
+Requests draw their measurements from a pool of --distinct samples, so
+with 100 distinct values nearly every request repeats an earlier one.
+Settings are max_size:quantum; "0:0" is no cache (the model runs for
+every request, micro-batched as usual). A max_size below --distinct
+makes the cache evict; a quantum of 0.5 merges nearby samples.
+
+`--clients` concurrent clients each send their next request as soon as
+the previous one was answered. Reported: requests per second, latency
+percentiles and the cache hit rate.
+
+Run it:
+    python code-examples/benchmarks/bench_ml_prediction_cache.py --distinct 100 10000 --settings 0:0 10000:0 1000:0 10000:0.5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+from common import ASGIClient, load_example, print_table, summarize
+
+FEATURES = ("sepal_length", "sepal_width", "petal_length", "petal_width")
+
+
+async def run_clients(client, samples, clients, requests, seed) -> dict:
+    latencies = []
+    rng = random.Random(seed)
+    order = [rng.choice(samples) for _ in range(requests)]
+    pending = iter(order)
+
+    async def one_client():
+        for body in pending:
+            start = time.perf_counter()
+            response = await client.post("/predict", body)
+            latencies.append(time.perf_counter() - start)
+            assert response.status == 200, response.status
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_client() for _ in range(clients)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", nargs="+", default=["0:0", "10000:0", "1000:0", "10000:0.5"],
+                        help="max_size:quantum pairs")
+    parser.add_argument("--distinct", type=int, nargs="+", default=[100, 10000], help="distinct samples sent")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=5000, help="requests per measurement")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+    # The ML example writes its model files to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench-"))
+    ml_api = load_example("phase6-ml/02_ml_web_integration.py", "ml_api")
+    client = ASGIClient(ml_api.app)
+
+    rows = []
+    for distinct in args.distinct:
+        rng = random.Random(distinct)
+        samples = [{name: round(rng.uniform(0.1, 7.9), 1) for name in FEATURES} for _ in range(distinct)]
+        for setting in args.settings:
+            size, quantum = setting.split(":")
+            cache = ml_api.prediction_cache = ml_api.PredictionCache(int(size), quantum=float(quantum))
+            result = await run_clients(client, samples, args.clients, args.requests, seed=distinct)
+            rows.append({
+                "distinct": distinct,
+                "size:quantum": setting,
+                **result,
+                "hit_rate": cache.metrics()["hit_rate"],
+            })
+
+    print_table(
+        f"POST /predict, {args.clients} clients (latency in microseconds)",
+        rows,
+        ["distinct", "size:quantum", "ops_per_sec", "p50_us", "p99_us", "hit_rate"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+TODO API - BATCH ENDPOINT BENCHMARK
+Single-item routes vs POST /api/todos/batch, for both storage backends
+
+Requests go through the full ASGI app in-process (routing, auth,
+validation, serialization) via httpx's ASGI transport; no network.
+
+Run it:
+    python code-examples/benchmarks/bench_todo_batch.py --todos 2000 --batch-size 500
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+import httpx
+
+from common import Timer, load_example, print_table
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def run_scenarios(label, client, headers, count, batch_size):
+    rows = []
+
+    def row(scenario, requests, elapsed):
+        return {
+            "store": label,
+            "scenario": scenario,
+            "requests": requests,
+            "elapsed_ms": elapsed * 1000,
+            "todos_per_sec": count / elapsed,
+        }
+
+    # Creates
+    with Timer() as t:
+        for i in range(count):
+            r = await client.post("/api/todos", json={"title": f"Single {i}"}, headers=headers)
+            r.raise_for_status()
+    rows.append(row("create: single route", count, t.elapsed))
+
+    creates = [{"op": "create", "title": f"Batched {i}"} for i in range(count)]
+    created_ids = []
+    with Timer() as t:
+        for part in chunks(creates, batch_size):
+            r = await client.post("/api/todos/batch", json={"operations": part}, headers=headers)
+            r.raise_for_status()
+            created_ids += [res["todo"]["id"] for res in r.json()["results"]]
+    rows.append(row("create: batch", -(-count // batch_size), t.elapsed))
+
+    # Toggles
+    with Timer() as t:
+        for todo_id in created_ids:
+            r = await client.patch(f"/api/todos/{todo_id}/toggle", headers=headers)
+            r.raise_for_status()
+    rows.append(row("toggle: single route", count, t.elapsed))
+
+    toggles = [{"op": "toggle", "id": todo_id} for todo_id in created_ids]
+    for atomic in (False, True):
+        with Timer() as t:
+            for part in chunks(toggles, batch_size):
+                r = await client.post(
+                    "/api/todos/batch", json={"operations": part, "atomic": atomic}, headers=headers
+                )
+                r.raise_for_status()
+        scenario = "toggle: batch (atomic)" if atomic else "toggle: batch"
+        rows.append(row(scenario, -(-count // batch_size), t.elapsed))
+
+    return rows
+
+
+async def bench(label, store, count, batch_size):
+    todo_api.store = store
+    transport = httpx.ASGITransport(app=todo_api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        r = await client.post("/api/auth/register", json={
+            "username": "bench", "email": f"bench-{label}@example.com", "password": "benchmark"
+        })
+        r.raise_for_status()
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        return await run_scenarios(label, client, headers, count, batch_size)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todos", type=int, default=2000, help="todos per scenario")
+    parser.add_argument("--batch-size", type=int, default=500, help="operations per batch (max 1000)")
+    args = parser.parse_args()
+
+    rows = await bench("memory", todo_api.InMemoryStore(), args.todos, args.batch_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_store = todo_api.SQLiteStore(os.path.join(tmp, "bench.db"))
+        try:
+            rows += await bench("sqlite", sqlite_store, args.todos, args.batch_size)
+        finally:
+            sqlite_store.close()
+
+    print_table(
+        f"{args.todos} todos per scenario, batches of {args.batch_size}",
+        rows,
+        ["store", "scenario", "requests", "elapsed_ms", "todos_per_sec"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""
+TODO API - DURABILITY BENCHMARK
+Write-ahead log throughput and crash recovery time of DurableInMemoryStore
+
+- writes:   todo creates from N concurrent clients, per fsync policy,
+            with the plain InMemoryStore as the no-durability baseline.
+            records/commit shows how many writes each group commit carried.
+- recovery: a store with T todos is snapshotted, then gets a log tail of
+            updates; a fresh store then recovers from disk. Reports the
+            time to load the snapshot (including rebuilding the sorted and
+            search indexes) and to replay the tail.
+
+Recovery needs about 0.7 GB of RAM per million todos (the recovered store
+itself); pick --todos to fit the machine.
+
+Run it:
+    python code-examples/benchmarks/bench_todo_durability.py
+    python code-examples/benchmarks/bench_todo_durability.py --todos 100000 1000000 --tail 100000
+"""
+
+import argparse
+import asyncio
+import gc
+import random
+import shutil
+import tempfile
+import time
+
+from common import Timer, load_example, print_table, summarize
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+WORDS = ["buy", "milk", "walk", "dog", "call", "mom", "pay", "rent", "fix", "bike", "read", "book"]
+
+
+async def bench_writes(label, store, clients, writes) -> dict:
+    user = await store.add_user("bench", "bench@example.com", "x")
+    latencies = []
+
+    async def client(count):
+        for i in range(count):
+            start = time.perf_counter()
+            await store.add_todo(user["id"], f"Todo {i}", "")
+            latencies.append(time.perf_counter() - start)
+
+    with Timer() as t:
+        await asyncio.gather(*(client(writes // clients) for _ in range(clients)))
+
+    row = {"store": label, "clients": clients, **summarize(latencies, t.elapsed)}
+    wal = store.metrics().get("wal")
+    if wal:
+        row["records_per_commit"] = wal["records_per_commit"]
+        row["fsyncs"] = wal["fsyncs"]
+    return row
+
+
+def fill(store, count, rng):
+    """Put `count` todos straight into memory (not logged, not measured)"""
+    users = [store.users_by_id[i] for i in range(1, store.next_user_id)]
+    now = todo_api.to_micros(todo_api.datetime.utcnow())
+    for i in range(count):
+        title = " ".join(rng.choices(WORDS, k=3))
+        todo = todo_api.TodoRecord(store.next_todo_id, users[i % len(users)]["id"], title, "", i % 3 == 0, now + i, now + i)
+        store.next_todo_id += 1
+        store._index_todo(todo)
+
+
+async def bench_recovery(count, tail, users) -> dict:
+    directory = tempfile.mkdtemp(prefix="wal-bench-")
+    try:
+        rng = random.Random(count)
+        store = todo_api.DurableInMemoryStore(directory, fsync="never", snapshot_bytes=2 ** 62)
+        for i in range(users):
+            await store.add_user(f"user{i}", f"user{i}@example.com", "x")
+        fill(store, count, rng)
+
+        with Timer() as snapshot_time:
+            snapshot = await store.snapshot()
+
+        # Log tail: updates of random todos since the snapshot
+        ids = list(store.todos_by_id)
+        for _ in range(tail):
+            todo = store.todos_by_id[rng.choice(ids)]
+            await store.update_todo(todo.user_id, todo.id, {"title": " ".join(rng.choices(WORDS, k=3))})
+        store.close()
+        del store, ids
+        gc.collect()
+
+        with Timer() as total:
+            recovered = todo_api.DurableInMemoryStore(directory, fsync="never")
+        stats = recovered.recovery
+        assert stats["snapshot_todos"] == count and stats["log_records"] == tail
+        recovered.close()
+        del recovered
+        gc.collect()
+        return {
+            "todos": count,
+            "tail_records": tail,
+            "snapshot_mb": snapshot["bytes"] / (1024 * 1024),
+            "write_snapshot_ms": snapshot_time.elapsed * 1000,
+            "load_snapshot_ms": stats["snapshot_seconds"] * 1000,
+            "replay_tail_ms": stats["replay_seconds"] * 1000,
+            "recovery_ms": total.elapsed * 1000,
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=4000, help="creates per write measurement")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16], help="concurrent writers")
+    parser.add_argument("--todos", type=int, nargs="+", default=[100000, 1000000], help="todos for recovery runs")
+    parser.add_argument("--tail", type=int, default=100000, help="log records written after the snapshot")
+    parser.add_argument("--users", type=int, default=1000, help="users owning the recovery todos")
+    args = parser.parse_args()
+
+    rows = []
+    for clients in args.clients:
+        rows.append(await bench_writes("memory", todo_api.InMemoryStore(), clients, args.writes))
+        for policy in todo_api.FSYNC_POLICIES:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = todo_api.DurableInMemoryStore(tmp, fsync=policy)
+                try:
+                    rows.append(await bench_writes(f"wal fsync={policy}", store, clients, args.writes))
+                finally:
+                    store.close()
+    print_table(
+        "Todo creates (latency in microseconds)",
+        rows,
+        ["store", "clients", "ops_per_sec", "p50_us", "p99_us", "records_per_commit", "fsyncs"],
+    )
+
+    rows = [await bench_recovery(count, args.tail, args.users) for count in args.todos]
+    print_table(
+        "Recovery (milliseconds)",
+        rows,
+        ["todos", "tail_records", "snapshot_mb", "write_snapshot_ms", "load_snapshot_ms", "replay_tail_ms", "recovery_ms"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
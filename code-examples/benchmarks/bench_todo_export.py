@@ -0,0 +1,97 @@
+"""
+TODO API - EXPORT BENCHMARK
+One big GET /api/todos page vs the streaming GET /api/todos/export
+
+For each store, all of one user's todos are fetched three ways:
+- list:         GET /api/todos?limit=N (one JSON array, built in memory)
+- export ndjson / export csv: streamed page by page
+
+Reports total time, time to first byte and peak Python heap during the
+request (tracemalloc, in a separate run so it doesn't skew the timings).
+Response bodies are counted, not kept, so the client adds no memory.
+
+Run it:
+    python code-examples/benchmarks/bench_todo_export.py --todos 50000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import tracemalloc
+
+from common import ASGIClient, Timer, load_example, print_table
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+
+async def fetch(client, url, headers, traced: bool) -> dict:
+    if traced:
+        tracemalloc.start()
+    with Timer() as t:
+        response = await client.request("GET", url, headers=headers, keep_body=False)
+    peak = tracemalloc.get_traced_memory()[1] if traced else 0
+    if traced:
+        tracemalloc.stop()
+    assert response.status == 200, response.status
+    return {
+        "elapsed_ms": t.elapsed * 1000,
+        "first_byte_ms": (response.first_byte_at - t.start) * 1000,
+        "body_mb": response.body_size / (1024 * 1024),
+        "peak_heap_mb": peak / (1024 * 1024),
+    }
+
+
+async def bench(label, store, count):
+    todo_api.store = store
+    client = ASGIClient(todo_api.app)
+    response = await client.post("/api/auth/register", {
+        "username": "bench", "email": f"bench-{label}@example.com", "password": "benchmark"
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    user_id = (await client.get("/api/auth/me", headers=headers)).json()["id"]
+
+    # Seed straight through the store (not measured)
+    operations = [
+        {"index": i, "op": "create", "id": None, "changes": {"title": f"Todo {i}", "description": "Seeded"}}
+        for i in range(count)
+    ]
+    for start in range(0, count, 1000):
+        await store.apply_batch(user_id, operations[start:start + 1000])
+
+    rows = []
+    for scenario, url in (
+        ("list", f"/api/todos?limit={count}"),
+        ("export ndjson", "/api/todos/export"),
+        ("export csv", "/api/todos/export?format=csv"),
+    ):
+        await fetch(client, url, headers, traced=False)  # warm up
+        timed = await fetch(client, url, headers, traced=False)
+        traced = await fetch(client, url, headers, traced=True)
+        rows.append({"store": label, "scenario": scenario, **timed, "peak_heap_mb": traced["peak_heap_mb"]})
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todos", type=int, default=50000, help="todos owned by the exporting user")
+    args = parser.parse_args()
+
+    rows = await bench("memory", todo_api.InMemoryStore(), args.todos)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_store = todo_api.SQLiteStore(os.path.join(tmp, "bench.db"))
+        try:
+            rows += await bench("sqlite", sqlite_store, args.todos)
+        finally:
+            sqlite_store.close()
+
+    print_table(
+        f"Fetching {args.todos} todos",
+        rows,
+        ["store", "scenario", "elapsed_ms", "first_byte_ms", "body_mb", "peak_heap_mb"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+TODO API - CHANGE FEED BENCHMARK
+Cost of pushing changes through ChangeFeed vs clients polling for them
+
+- push:  one user with S live subscribers (consumer tasks like the SSE
+         and WebSocket routes run). Measures the cost of publish() per
+         change and the delay until each subscriber has the event.
+- poll:  one GET /api/todos request through the app, both as a 304
+         (If-None-Match, nothing changed) and as a full 200 (20 todos).
+         Each polling client pays this on every poll, changes or not.
+
+Run it:
+    python code-examples/benchmarks/bench_todo_feed.py --subscribers 1 10 100 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from common import ASGIClient, load_example, print_table, summarize
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+
+async def bench_push(subscribers: int, events: int) -> dict:
+    feed = todo_api.ChangeFeed(max_queue=events + 1)
+    todo = todo_api.TodoRecord(1, 1, "Buy milk", "", False, 0, 0)
+    published_at = {}
+    delays = []
+
+    async def consumer(subscription):
+        received = 0
+        while received < events:
+            for seq, _, _ in await subscription.next_events(10.0):
+                delays.append(time.perf_counter() - published_at[seq])
+                received += 1
+
+    tasks = []
+    for _ in range(subscribers):
+        subscription, _ = feed.subscribe(1)
+        tasks.append(asyncio.create_task(consumer(subscription)))
+    await asyncio.sleep(0)
+
+    costs = []
+    for _ in range(events):
+        start = time.perf_counter()
+        feed.publish(1, "updated", todo)
+        costs.append(time.perf_counter() - start)
+        published_at[feed.feeds[1].seq] = start
+        await asyncio.sleep(0)  # let the consumers run, like between requests
+    await asyncio.gather(*tasks)
+
+    publish = summarize(costs, sum(costs))
+    row = {"case": "push", "clients": subscribers, "per_change_us": publish["p50_us"]}
+    if delays:
+        delivery = summarize(delays, sum(delays))
+        row["delivery_p50_us"] = delivery["p50_us"]
+        row["delivery_p99_us"] = delivery["p99_us"]
+    return row
+
+
+async def bench_poll(requests: int) -> list:
+    todo_api.store = todo_api.InMemoryStore()
+    client = ASGIClient(todo_api.app)
+    response = await client.post("/api/auth/register", {
+        "username": "bench", "email": "bench@example.com", "password": "benchmark"
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    for i in range(20):
+        await client.post("/api/todos", {"title": f"Todo {i}"}, headers=headers)
+    etag = (await client.get("/api/todos?limit=20", headers=headers)).headers["etag"]
+
+    rows = []
+    for label, request_headers in (("poll 304", {**headers, "If-None-Match": etag}), ("poll 200", headers)):
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            await client.get("/api/todos?limit=20", headers=request_headers)
+            latencies.append(time.perf_counter() - start)
+        rows.append({"case": label, "clients": 1, "per_change_us": summarize(latencies, sum(latencies))["p50_us"]})
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[0, 1, 10, 100, 1000], help="live subscribers")
+    parser.add_argument("--events", type=int, default=2000, help="changes published per measurement")
+    parser.add_argument("--requests", type=int, default=2000, help="poll requests per measurement")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+
+    rows = [await bench_push(count, args.events) for count in args.subscribers]
+    rows += await bench_poll(args.requests)
+    print_table(
+        "Push vs poll (microseconds; per_change_us = publish() for push, one request for poll)",
+        rows,
+        ["case", "clients", "per_change_us", "delivery_p50_us", "delivery_p99_us"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
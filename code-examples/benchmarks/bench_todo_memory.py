@@ -0,0 +1,90 @@
+"""
+TODO API - MEMORY PER TODO
+Bytes per todo for the old dict layout vs TodoRecord, measured with tracemalloc
+
+- dict layout:  what the API used to store (7-key dict, two datetimes)
+- TodoRecord:   the __slots__ record with integer timestamps
+- InMemoryStore: TodoRecord plus every index the store keeps per todo
+
+Run it:
+    python code-examples/benchmarks/bench_todo_memory.py --todos 200000
+"""
+
+import argparse
+import asyncio
+import gc
+import tracemalloc
+from datetime import datetime
+
+from common import load_example, print_table
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+
+def make_title(i: int) -> str:
+    # A fresh string object each time, like titles parsed from request bodies
+    return f"Buy item {i % 1000}"
+
+
+def build_dicts(count):
+    return [
+        {
+            "id": i,
+            "user_id": i % 100,
+            "title": make_title(i),
+            "description": "",
+            "completed": False,
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        }
+        for i in range(count)
+    ]
+
+
+def build_records(count):
+    now = todo_api.to_micros(datetime.utcnow())
+    records = []
+    for i in range(count):
+        created = now + i  # A new todo shares one int for created/updated, as in add_todo
+        records.append(todo_api.TodoRecord(i, i % 100, make_title(i), "", False, created, created))
+    return records
+
+
+def build_store(count):
+    store = todo_api.InMemoryStore()
+
+    async def fill():
+        for i in range(count):
+            await store.add_todo(i % 100, make_title(i), "")
+
+    asyncio.run(fill())
+    return store
+
+
+def measure(builder, count):
+    """Bytes allocated (and still alive) per todo by builder(count)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = builder(count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--todos", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rows = [
+        {"layout": "dict + datetimes", "bytes_per_todo": measure(build_dicts, args.todos)},
+        {"layout": "TodoRecord", "bytes_per_todo": measure(build_records, args.todos)},
+        {"layout": "InMemoryStore (records + indexes)", "bytes_per_todo": measure(build_store, args.todos)},
+    ]
+    print_table(f"Memory for {args.todos:,} todos (tracemalloc)", rows, ["layout", "bytes_per_todo"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+TODO API - SEARCH BENCHMARK
+Search latency as one user's todo count grows, for both storage backends
+
+Titles and descriptions are random words from a fixed vocabulary, plus a
+"needle" word in exactly 10 todos. Queries:
+- rare term:       needle            (10 matches at every size)
+- rare + prefix:   needle wor*       (AND with a prefix term)
+- common prefix:   a*                (matches grow with the todo count)
+- naive scan:      every todo tokenized per query, for comparison
+
+Run it:
+    python code-examples/benchmarks/bench_todo_search.py --sizes 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from common import load_example, print_table, summarize
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+QUERIES = [
+    ("rare term", "needle"),
+    ("rare + prefix", "needle wor*"),
+    ("common prefix", "a*"),
+]
+
+
+def make_vocabulary(rng, size=2000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 8))) for _ in range(size)] + ["world", "work"]
+
+
+async def fill(store, user_id, count, rng, vocabulary):
+    needles = set(rng.sample(range(count), 10))
+    operations = []
+    for i in range(count):
+        title = " ".join(rng.choices(vocabulary, k=3))
+        description = " ".join(rng.choices(vocabulary, k=8))
+        if i in needles:
+            title += " needle work"
+        operations.append({"index": i, "op": "create", "id": None, "changes": {"title": title, "description": description}})
+    for start in range(0, count, 1000):
+        await store.apply_batch(user_id, operations[start:start + 1000])
+
+
+async def time_query(store, user_id, query, repeat) -> dict:
+    terms = todo_api.parse_search_query(query)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await store.search_todos(user_id, terms, 20)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, sum(latencies))
+
+
+async def naive_scan(store, user_id, repeat) -> dict:
+    """What search costs without an index: tokenize every todo on each query"""
+    latencies = []
+    todos = await store.list_todos(user_id, limit=10 ** 9)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        [t for t in todos if "needle" in todo_api.tokenize(t.title + " " + t.description)]
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, sum(latencies))
+
+
+async def bench(label, make_store, sizes, repeat):
+    rows = []
+    for size in sizes:
+        rng = random.Random(size)
+        store = make_store(size)
+        try:
+            user = await store.add_user("bench", f"bench-{size}@example.com", "x")
+            await fill(store, user["id"], size, rng, make_vocabulary(rng))
+            for name, query in QUERIES:
+                result = await time_query(store, user["id"], query, repeat)
+                rows.append({"store": label, "todos": size, "query": name, **result})
+            if label == "memory":
+                result = await naive_scan(store, user["id"], max(3, repeat // 50))
+                rows.append({"store": "(scan)", "todos": size, "query": "rare term", **result})
+        finally:
+            store.close()
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="todos per user")
+    parser.add_argument("--repeat", type=int, default=200, help="queries per measurement")
+    args = parser.parse_args()
+
+    rows = await bench("memory", lambda size: todo_api.InMemoryStore(), args.sizes, args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows += await bench(
+            "sqlite", lambda size: todo_api.SQLiteStore(os.path.join(tmp, f"search-{size}.db")), args.sizes, args.repeat
+        )
+
+    print_table(
+        "Search latency, top 20 results (microseconds)",
+        rows,
+        ["store", "todos", "query", "p50_us", "p95_us", "p99_us"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
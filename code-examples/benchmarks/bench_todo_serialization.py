@@ -0,0 +1,119 @@
+"""
+TODO API - RESPONSE SERIALIZATION BENCHMARK
+Default response_model path vs the opt-in precompiled encoders (TODO_FAST_RESPONSES)
+
+For each list size, one user's todos are returned two ways:
+- encode only:  TypeAdapter(List[TodoResponse]) validate + dump_json
+                (what FastAPI does with a response_model) vs the
+                compiled TODO_ENCODER, without the rest of the request
+- request:      GET /api/todos?limit=N through the whole app, with
+                FAST_RESPONSES off and on
+
+Both paths must produce the same bytes; the benchmark checks that first.
+
+Run it:
+    python code-examples/benchmarks/bench_todo_serialization.py --sizes 1000 10000
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from common import ASGIClient, load_example, print_table, summarize
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+
+def time_calls(func, repeat) -> list:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def time_requests(client, url, headers, repeat) -> list:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await client.get(url, headers=headers)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def row(size, case, path, latencies) -> dict:
+    result = summarize(latencies, sum(latencies))
+    return {"todos": size, "case": case, "path": path, "p50_ms": result["p50_us"] / 1000, "p99_ms": result["p99_us"] / 1000}
+
+
+async def bench(size, repeat) -> list:
+    todo_api.store = todo_api.InMemoryStore()
+    client = ASGIClient(todo_api.app)
+    response = await client.post("/api/auth/register", {
+        "username": "bench", "email": f"bench-{size}@example.com", "password": "benchmark"
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    user_id = (await client.get("/api/auth/me", headers=headers)).json()["id"]
+
+    operations = [
+        {"index": i, "op": "create", "id": None, "changes": {"title": f"Todo {i}", "description": "Seeded todo"}}
+        for i in range(size)
+    ]
+    for start in range(0, size, 1000):
+        await todo_api.store.apply_batch(user_id, operations[start:start + 1000])
+    todos = await todo_api.store.list_todos(user_id, limit=size)
+    url = f"/api/todos?limit={size}"
+
+    # Same bytes either way, or the comparison means nothing
+    bodies = []
+    for fast in (False, True):
+        todo_api.FAST_RESPONSES = fast
+        bodies.append((await client.get(url, headers=headers)).body)
+    assert bodies[0] == bodies[1], "fast path output differs"
+
+    adapter = TypeAdapter(List[todo_api.TodoResponse])
+    encoder = todo_api.TODO_ENCODER
+    rows = [
+        row(size, "encode only", "response_model", time_calls(
+            lambda: adapter.dump_json(adapter.validate_python(todos, from_attributes=True)), repeat)),
+        row(size, "encode only", "compiled", time_calls(
+            lambda: ("[" + ",".join(map(encoder, todos)) + "]").encode(), repeat)),
+    ]
+    for fast in (False, True):
+        todo_api.FAST_RESPONSES = fast
+        await time_requests(client, url, headers, 3)  # warm up
+        latencies = await time_requests(client, url, headers, repeat)
+        rows.append(row(size, f"GET {url}", "compiled" if fast else "response_model", latencies))
+    todo_api.FAST_RESPONSES = False
+
+    for fast_row, slow_row in ((rows[1], rows[0]), (rows[3], rows[2])):
+        fast_row["speedup"] = slow_row["p50_ms"] / fast_row["p50_ms"]
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="todos per response")
+    parser.add_argument("--repeat", type=int, default=50, help="measurements per case")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+
+    rows = []
+    for size in args.sizes:
+        rows += await bench(size, args.repeat)
+    print_table(
+        "Serializing todo lists (milliseconds)",
+        rows,
+        ["todos", "case", "path", "p50_ms", "p99_ms", "speedup"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
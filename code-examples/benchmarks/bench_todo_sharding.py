@@ -0,0 +1,161 @@
+"""
+TODO API - SHARDED STORE STRESS TEST
+Many threads changing todos in one shared store at the same time
+
+Every thread runs its own event loop and fires a create/update/toggle/
+delete mix at random users, so calls from different threads overlap
+inside the store. Stores compared:
+- memory (no lock):  plain InMemoryStore, only safe on one event loop
+- sharded x1:        ShardedInMemoryStore with 1 shard (one global lock)
+- sharded xN:        ShardedInMemoryStore with N shards
+
+Afterwards each user's todo count and version counter are checked against
+what the threads did, and todo ids must be unique. Any mismatch or
+exception counts as an error (a lost update). The interpreter's thread
+switch interval is lowered so threads interleave often.
+
+With the GIL, threads take turns running Python, so throughput can't
+grow with threads; the shards only remove lock waits. Real scaling needs
+a free-threaded build (python3.13t) and several cores.
+
+Run it:
+    python code-examples/benchmarks/bench_todo_sharding.py --threads 1 2 4 8 --shards 16
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from common import load_example, print_table
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+
+class Worker:
+    """One thread's share of the load, and what it did"""
+
+    def __init__(self, store, user_ids, ops, seed):
+        self.store = store
+        self.user_ids = user_ids
+        self.ops = ops
+        self.rng = random.Random(seed)
+        self.created = Counter()   # user id -> todos created
+        self.deleted = Counter()   # user id -> todos deleted
+        self.bumps = Counter()     # user id -> version bumps
+        self.ids = []
+        self.errors = 0
+
+    async def run(self):
+        owned = {user_id: [] for user_id in self.user_ids}
+        store, rng = self.store, self.rng
+        for _ in range(self.ops):
+            user_id = rng.choice(self.user_ids)
+            todos = owned[user_id]
+            kind = rng.random()
+            try:
+                if kind < 0.4 or not todos:
+                    todo = await store.add_todo(user_id, "Stress", "")
+                    todos.append(todo.id)
+                    self.ids.append(todo.id)
+                    self.created[user_id] += 1
+                elif kind < 0.7:
+                    if await store.toggle_todo(user_id, rng.choice(todos)) is None:
+                        raise LookupError("todo vanished")
+                elif kind < 0.9:
+                    if await store.update_todo(user_id, rng.choice(todos), {"title": "Renamed"}) is None:
+                        raise LookupError("todo vanished")
+                else:
+                    if not await store.delete_todo(user_id, todos.pop(rng.randrange(len(todos)))):
+                        raise LookupError("todo vanished")
+                    self.deleted[user_id] += 1
+                self.bumps[user_id] += 1
+            except Exception:
+                self.errors += 1
+
+    def start(self, barrier):
+        def target():
+            barrier.wait()
+            asyncio.run(self.run())
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread
+
+
+async def setup(store, users):
+    user_ids = []
+    for i in range(users):
+        user = await store.add_user(f"user{i}", f"user{i}@example.com", "x")
+        user_ids.append(user["id"])
+    versions = {user_id: await store.get_todo_version(user_id) for user_id in user_ids}
+    return user_ids, versions
+
+
+async def check(store, workers, user_ids, versions) -> int:
+    """Count users whose final state doesn't add up, plus duplicate ids"""
+    errors = 0
+    for user_id in user_ids:
+        expected = sum(w.created[user_id] - w.deleted[user_id] for w in workers)
+        todos = await store.list_todos(user_id, limit=10 ** 9)
+        bumps = sum(w.bumps[user_id] for w in workers)
+        if len(todos) != expected or await store.get_todo_version(user_id) - versions[user_id] != bumps:
+            errors += 1
+    ids = [todo_id for w in workers for todo_id in w.ids]
+    return errors + len(ids) - len(set(ids))
+
+
+def bench(label, make_store, threads, users, ops) -> dict:
+    store = make_store()
+    user_ids, versions = asyncio.run(setup(store, users))
+    workers = [Worker(store, user_ids, ops // threads, seed) for seed in range(threads)]
+
+    barrier = threading.Barrier(threads + 1)
+    running = [w.start(barrier) for w in workers]
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in running:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    errors = sum(w.errors for w in workers) + asyncio.run(check(store, workers, user_ids, versions))
+    return {
+        "store": label,
+        "threads": threads,
+        "ops_per_sec": threads * (ops // threads) / elapsed,
+        "lock_contended": store.metrics().get("lock_contended", "-"),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8], help="concurrent threads")
+    parser.add_argument("--shards", type=int, default=16, help="shards of the sharded store")
+    parser.add_argument("--users", type=int, default=64, help="users the threads spread over")
+    parser.add_argument("--ops", type=int, default=40000, help="operations per run, split between threads")
+    parser.add_argument("--switch-interval", type=float, default=1e-5, help="sys.setswitchinterval in seconds")
+    args = parser.parse_args()
+
+    sys.setswitchinterval(args.switch_interval)
+    stores = [
+        ("memory (no lock)", todo_api.InMemoryStore),
+        ("sharded x1", lambda: todo_api.ShardedInMemoryStore(shards=1)),
+        (f"sharded x{args.shards}", lambda: todo_api.ShardedInMemoryStore(shards=args.shards)),
+    ]
+    rows = [
+        bench(label, make_store, threads, args.users, args.ops)
+        for label, make_store in stores
+        for threads in args.threads
+    ]
+    print_table(
+        f"{args.ops} operations over {args.users} users",
+        rows,
+        ["store", "threads", "ops_per_sec", "lock_contended", "errors"],
+    )
+
+
+if __name__ == "__main__":
+    main()
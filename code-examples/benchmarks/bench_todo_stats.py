@@ -0,0 +1,99 @@
+"""
+TODO API - STATS BENCHMARK
+GET /api/todos/stats vs counting the todos client-side
+
+- stats:        GET /api/todos/stats (counters kept up to date by writes)
+- full list:    GET /api/todos?limit=N, then count completed todos, which
+                is what a client without the stats route has to do
+
+Run it:
+    python code-examples/benchmarks/bench_todo_stats.py --sizes 100 10000 100000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from common import ASGIClient, load_example, print_table, summarize
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+
+async def time_calls(call, repeat) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, sum(latencies))
+
+
+async def bench(label, store, size, repeat) -> list:
+    todo_api.store = store
+    client = ASGIClient(todo_api.app)
+    response = await client.post("/api/auth/register", {
+        "username": "bench", "email": f"bench-{label}-{size}@example.com", "password": "benchmark"
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    user_id = (await client.get("/api/auth/me", headers=headers)).json()["id"]
+
+    # Seed straight through the store (not measured), every third one done
+    operations = [
+        {"index": i, "op": "create", "id": None, "changes": {"title": f"Todo {i}", "description": ""}}
+        for i in range(size)
+    ]
+    for start in range(0, size, 1000):
+        await store.apply_batch(user_id, operations[start:start + 1000])
+    for todo in await store.list_todos(user_id, limit=size):
+        if todo.id % 3 == 0:
+            await store.toggle_todo(user_id, todo.id)
+
+    async def stats():
+        return (await client.get("/api/todos/stats", headers=headers)).json()
+
+    async def full_list():
+        todos = (await client.get(f"/api/todos?limit={size}", headers=headers)).json()
+        return {"total": len(todos), "completed": sum(t["completed"] for t in todos)}
+
+    expected = await full_list()
+    result = await stats()
+    assert (result["total"], result["completed"]) == (expected["total"], expected["completed"]), result
+
+    return [
+        {"store": label, "todos": size, "method": "stats", **await time_calls(stats, repeat)},
+        {"store": label, "todos": size, "method": "full list", **await time_calls(full_list, max(3, repeat // 100))},
+    ]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000], help="todos of the user")
+    parser.add_argument("--repeat", type=int, default=1000, help="stats requests per measurement")
+    args = parser.parse_args()
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+
+    rows = []
+    for size in args.sizes:
+        rows += await bench("memory", todo_api.InMemoryStore(), size, args.repeat)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            sqlite_store = todo_api.SQLiteStore(os.path.join(tmp, f"stats-{size}.db"))
+            try:
+                rows += await bench("sqlite", sqlite_store, size, args.repeat)
+            finally:
+                sqlite_store.close()
+
+    print_table(
+        "Todo counts per request (microseconds)",
+        rows,
+        ["store", "todos", "method", "p50_us", "p95_us", "p99_us"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
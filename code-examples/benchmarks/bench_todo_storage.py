@@ -0,0 +1,152 @@
+"""
+TODO API - STORAGE BACKEND BENCHMARK
+Compare InMemoryStore and SQLiteStore from phase3-backend/02_fastapi_basics.py
+
+Measures per-operation latency for the calls the routes make, the cost
+of a deep page with skip/limit versus a keyset cursor, and the worst
+event-loop stall while many SQLite queries run concurrently (it
+should stay small because queries run in the store's thread pool).
+
+Run it:
+    python code-examples/benchmarks/bench_todo_storage.py --users 100 --todos 100
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from common import Timer, load_example, print_table, summarize
+
+todo_api = load_example("phase3-backend/02_fastapi_basics.py", "todo_api")
+
+
+async def timed_ops(name, make_call, count):
+    """Await `make_call(i)` count times and summarize the latencies"""
+    latencies = []
+    with Timer() as total:
+        for i in range(count):
+            start = time.perf_counter()
+            await make_call(i)
+            latencies.append(time.perf_counter() - start)
+    return {"operation": name, **summarize(latencies, total.elapsed)}
+
+
+async def max_loop_lag(coro, interval=0.001):
+    """Run `coro` while a ticker measures how late the event loop wakes up"""
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(lag, time.perf_counter() - start - interval)
+
+    tick = asyncio.create_task(ticker())
+    await coro
+    done = True
+    await tick
+    return lag
+
+
+async def bench_store(label, store, users, todos_per_user, ops):
+    rng = random.Random(42)
+
+    # Populate
+    user_ids = []
+    with Timer() as populate:
+        for u in range(users):
+            user = await store.add_user(f"user{u}", f"user{u}@example.com", "not-a-real-hash")
+            user_ids.append(user["id"])
+            for t in range(todos_per_user):
+                await store.add_todo(user["id"], f"Todo {t}", "benchmark item")
+    inserted = users * todos_per_user
+    print(f"[{label}] inserted {users} users / {inserted} todos in {populate.elapsed:.2f}s")
+
+    owned = {}
+    for user_id in user_ids:
+        owned[user_id] = [t.id for t in await store.list_todos(user_id, limit=todos_per_user)]
+
+    # Keyset cursor = (created_at, id) of the todo just before the last 10
+    cursors = {}
+    for user_id in user_ids:
+        page = await store.list_todos(user_id, skip=max(todos_per_user - 11, 0), limit=1)
+        cursors[user_id] = (page[0].created_at, page[0].id) if page else None
+
+    def last_page(user_id):
+        return store.list_todos(user_id, limit=10, after=cursors[user_id])
+
+    def pick():
+        user_id = rng.choice(user_ids)
+        return user_id, rng.choice(owned[user_id])
+
+    rows = [
+        await timed_ops("get_user", lambda i: store.get_user(rng.choice(user_ids)), ops),
+        await timed_ops("get_user_by_email", lambda i: store.get_user_by_email(f"user{rng.randrange(users)}@example.com"), ops),
+        await timed_ops("get_todo", lambda i: store.get_todo(*pick()), ops),
+        await timed_ops("list_todos(limit=100)", lambda i: store.list_todos(rng.choice(user_ids), limit=100), ops),
+        await timed_ops("list_todos(last page, skip)", lambda i: store.list_todos(
+            rng.choice(user_ids), skip=max(todos_per_user - 10, 0), limit=10), ops),
+        await timed_ops("list_todos(last page, cursor)", lambda i: last_page(rng.choice(user_ids)), ops),
+        await timed_ops("add_todo", lambda i: store.add_todo(rng.choice(user_ids), "New todo", ""), ops),
+        await timed_ops("update_todo", lambda i: store.update_todo(*pick(), {"title": f"Renamed {i}"}), ops),
+        await timed_ops("toggle_todo", lambda i: store.toggle_todo(*pick()), ops),
+    ]
+
+    # Delete distinct todos so every call hits an existing row
+    victims = [(user_id, todo_id) for user_id in user_ids for todo_id in owned[user_id]]
+    rng.shuffle(victims)
+    victims = victims[:ops]
+    rows.append(await timed_ops("delete_todo", lambda i: store.delete_todo(*victims[i]), len(victims)))
+
+    # Event-loop responsiveness under concurrent load
+    concurrent = [store.get_todo(*pick()) for _ in range(ops)]
+    lag = await max_loop_lag(asyncio.gather(*concurrent))
+
+    for row in rows:
+        row["store"] = label
+    return rows, lag
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--todos", type=int, default=100, help="todos per user")
+    parser.add_argument("--ops", type=int, default=2000, help="operations per measurement")
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    results = []
+    lags = {}
+
+    memory_rows, lags["memory"] = await bench_store(
+        "memory", todo_api.InMemoryStore(), args.users, args.todos, args.ops
+    )
+    results += memory_rows
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_store = todo_api.SQLiteStore(os.path.join(tmp, "bench.db"), pool_size=args.pool_size)
+        try:
+            sqlite_rows, lags["sqlite"] = await bench_store(
+                "sqlite", sqlite_store, args.users, args.todos, args.ops
+            )
+        finally:
+            sqlite_store.close()
+    results += sqlite_rows
+
+    print_table(
+        "Per-operation latency",
+        results,
+        ["store", "operation", "ops_per_sec", "mean_us", "p50_us", "p95_us", "p99_us"],
+    )
+    print("\nMax event-loop stall during concurrent get_todo calls:")
+    for label, lag in lags.items():
+        print(f"  {label:<7} {lag * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+"""
+TODO API - MULTI-WORKER BENCHMARK
+Throughput of `uvicorn --workers N` sharing one SQLite database
+
+For each worker count, a real uvicorn server is started on a fresh
+database and driven over HTTP by concurrent clients (keep-alive
+connections, so requests spread over the worker processes):
+- users register and get tokens, then run a mix of list / get / create /
+  toggle for a fixed time, every user from several connections
+- errors count any non-2xx answer: a token issued by one worker and
+  rejected by another would show up here
+- created todo ids must all be distinct across workers
+
+The plain in-memory store runs with one worker as a reference; it cannot
+be shared between processes.
+
+The load generator runs on the same machine: with few CPUs it competes
+with the workers, so compare the trend, not the absolute numbers.
+
+Run it:
+    python code-examples/benchmarks/bench_todo_workers.py --workers 1 2 4 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from common import print_table, summarize
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "phase3-backend")
+MIX = [("list", 60), ("get", 20), ("create", 10), ("toggle", 10)]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, store: str, db_path: str, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        TODO_STORE=store,
+        TODO_DB_PATH=db_path,
+        AUTH_RATE_LIMIT="0",   # every client comes from 127.0.0.1
+        PASSWORD_HASH_WORKERS="1",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "02_fastapi_basics:app",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=APP_DIR, env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def drive(base_url: str, users: int, connections: int, seconds: float, seed: int) -> dict:
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        tokens = []
+        for i in range(users):
+            response = await client.post("/api/auth/register", json={
+                "username": f"user{i}", "email": f"user{i}@example.com", "password": "benchmark"
+            })
+            response.raise_for_status()
+            tokens.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+        owned = [[] for _ in tokens]
+        for headers, ids in zip(tokens, owned):
+            for j in range(20):
+                response = await client.post("/api/todos", json={"title": f"Seed {j}"}, headers=headers)
+                ids.append(response.json()["id"])
+
+        rng = random.Random(seed)
+        kinds = [kind for kind, weight in MIX for _ in range(weight)]
+        created = []
+        latencies = []
+        errors = 0
+        deadline = time.perf_counter() + seconds
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                user = rng.randrange(len(tokens))
+                headers, ids, kind = tokens[user], owned[user], rng.choice(kinds)
+                start = time.perf_counter()
+                if kind == "list":
+                    response = await client.get("/api/todos?limit=20", headers=headers)
+                elif kind == "get":
+                    response = await client.get(f"/api/todos/{rng.choice(ids)}", headers=headers)
+                elif kind == "create":
+                    response = await client.post("/api/todos", json={"title": "New todo"}, headers=headers)
+                    if response.status_code == 201:
+                        created.append(response.json()["id"])
+                else:
+                    response = await client.patch(f"/api/todos/{rng.choice(ids)}/toggle", headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 300:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(connections)))
+        result = summarize(latencies, time.perf_counter() - started)
+
+    seeded = [todo_id for ids in owned for todo_id in ids]
+    result["errors"] = errors
+    result["duplicate_ids"] = len(seeded + created) - len(set(seeded + created))
+    return result
+
+
+async def bench(store: str, workers: int, args) -> dict:
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        server = start_server(workers, store, os.path.join(tmp, "todos.db"), port)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                await wait_ready(client, server)
+            # Give every worker time to come up before measuring
+            await asyncio.sleep(1.0 + 0.5 * workers)
+            result = await drive(base_url, args.users, args.connections, args.seconds, seed=workers)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return {"store": store, "workers": workers, **result}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="uvicorn worker counts")
+    parser.add_argument("--users", type=int, default=8, help="registered users")
+    parser.add_argument("--connections", type=int, default=32, help="concurrent client connections")
+    parser.add_argument("--seconds", type=float, default=10.0, help="measurement time per run")
+    args = parser.parse_args()
+
+    rows = [await bench("memory", 1, args)]
+    for workers in args.workers:
+        rows.append(await bench("sqlite", workers, args))
+    base = rows[1]["ops_per_sec"]
+    for row in rows[1:]:
+        row["scaling"] = row["ops_per_sec"] / base
+
+    print_table(
+        f"Todo API over HTTP, {args.connections} connections, {os.cpu_count()} CPUs (latency in microseconds)",
+        rows,
+        ["store", "workers", "ops", "ops_per_sec", "p50_us", "p99_us", "errors", "duplicate_ids", "scaling"],
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+"""
+BENCHMARK HELPERS
+Shared utilities for the benchmark scripts in this folder
+
+The example apps live in files whose names start with a number
+(02_fastapi_basics.py), which `import` can't handle, so they are
+loaded by path instead.
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_example(relative_path: str, module_name: str):
+    """Import an example file, e.g. load_example("phase3-backend/02_fastapi_basics.py", "todo_api")"""
+    path = os.path.join(EXAMPLES_DIR, relative_path)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed: float) -> dict:
+    """Turn per-operation latencies (seconds) into a result row"""
+    ordered = sorted(latencies)
+    return {
+        "ops": len(ordered),
+        "ops_per_sec": len(ordered) / elapsed if elapsed else 0.0,
+        "mean_us": statistics.fmean(ordered) * 1e6 if ordered else 0.0,
+        "p50_us": percentile(ordered, 50) * 1e6,
+        "p95_us": percentile(ordered, 95) * 1e6,
+        "p99_us": percentile(ordered, 99) * 1e6,
+    }
+
+
+def print_table(title: str, rows: list, columns: list) -> None:
+    """Print result rows (dicts) as an aligned text table"""
+    print(f"\n{title}")
+    print("-" * len(title))
+    widths = [max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:,.1f}"
+    return str(value)
+
+
+class Timer:
+    """Context manager measuring wall-clock time with perf_counter"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+class ASGIResponse:
+    """Status, headers and body collected from an ASGI app"""
+
+    def __init__(self, status: int, headers: dict, body: bytes, body_size: int = 0, first_byte_at: float = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.body_size = body_size          # counted even when the body was not kept
+        self.first_byte_at = first_byte_at  # perf_counter() when the first body bytes arrived
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class ASGIClient:
+    """
+    Minimal in-process HTTP client: calls the ASGI app directly
+
+    No sockets and no HTTP parsing, so measured latency is the app's own
+    (routing, validation, handler, serialization) plus a few microseconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(
+        self, method: str, url: str, json_body=None, headers: dict = None, keep_body: bool = True
+    ) -> ASGIResponse:
+        path, _, query = url.partition("?")
+        body = b"" if json_body is None else json.dumps(json_body).encode()
+
+        raw_headers = [(b"host", b"bench")]
+        if json_body is not None:
+            raw_headers.append((b"content-type", b"application/json"))
+            raw_headers.append((b"content-length", str(len(body)).encode()))
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), value.encode()))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+
+        request_sent = False
+        response_done = asyncio.Event()
+        status = 500
+        response_headers = {}
+        chunks = []
+        body_size = 0
+        first_byte_at = None
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, body_size, first_byte_at
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", []):
+                    response_headers[name.decode().lower()] = value.decode()
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                if chunk and first_byte_at is None:
+                    first_byte_at = time.perf_counter()
+                body_size += len(chunk)
+                if keep_body:
+                    chunks.append(chunk)
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        await self.app(scope, receive, send)
+        response_done.set()
+        return ASGIResponse(status, response_headers, b"".join(chunks), body_size, first_byte_at)
+
+    async def get(self, url: str, **kwargs) -> ASGIResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, json_body=None, **kwargs) -> ASGIResponse:
+        return await self.request("POST", url, json_body=json_body, **kwargs)
+
+    async def put(self, url: str, json_body=None, **kwargs) -> ASGIResponse:
+        return await self.request("PUT", url, json_body=json_body, **kwargs)
+
+    async def patch(self, url: str, json_body=None, **kwargs) -> ASGIResponse:
+        return await self.request("PATCH", url, json_body=json_body, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> ASGIResponse:
+        return await self.request("DELETE", url, **kwargs)
@@ -0,0 +1,330 @@
+"""
+LOAD & LATENCY BENCHMARK SUITE
+Scripted scenarios against both example APIs, driven in-process
+
+Apps:
+- Todo API  (phase3-backend/02_fastapi_basics.py)
+- ML API    (phase6-ml/02_ml_web_integration.py)
+
+Requests are passed straight to the ASGI apps (no sockets), with a
+configurable number of concurrent clients. Every scenario reports
+p50/p95/p99 latency, requests per second, error count and peak memory.
+Results can be saved as JSON and compared with an earlier run to flag
+regressions.
+
+Run it:
+    python code-examples/benchmarks/run_suite.py
+    python code-examples/benchmarks/run_suite.py --output baseline.json
+    python code-examples/benchmarks/run_suite.py --compare baseline.json --threshold 10
+    python code-examples/benchmarks/run_suite.py --scenario todo.crud_mix --scenario ml.predict_batch
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from common import ASGIClient, Timer, load_example, print_table, summarize
+
+IRIS_SAMPLES = [
+    {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2},
+    {"sepal_length": 6.7, "sepal_width": 3.1, "petal_length": 4.7, "petal_width": 1.5},
+    {"sepal_length": 6.3, "sepal_width": 3.3, "petal_length": 6.0, "petal_width": 2.5},
+    {"sepal_length": 5.8, "sepal_width": 2.7, "petal_length": 5.1, "petal_width": 1.9},
+]
+
+
+# ============================================
+# LOAD GENERATOR
+# ============================================
+
+async def run_load(calls, concurrency: int) -> dict:
+    """
+    Run zero-argument coroutine factories with `concurrency` virtual clients
+
+    Each client takes the next call as soon as its previous one finished
+    (closed-loop load), like a fixed pool of real clients would.
+    """
+    latencies = []
+    errors = 0
+    pending = iter(calls)
+
+    async def client():
+        nonlocal errors
+        for call in pending:
+            start = time.perf_counter()
+            response = await call()
+            latencies.append(time.perf_counter() - start)
+            if response.status >= 400:
+                errors += 1
+
+    with Timer() as total:
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    result = summarize(latencies, total.elapsed)
+    result["errors"] = errors
+    result["concurrency"] = concurrency
+    return result
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# ============================================
+# TODO API SCENARIOS
+# ============================================
+
+class TodoScenarios:
+    """Shared state: users registered by one scenario are reused by the next"""
+
+    def __init__(self, app_module, args):
+        self.api = app_module
+        self.client = ASGIClient(app_module.app)
+        self.args = args
+        self.users = []  # (email, auth headers)
+        self.rng = random.Random(42)
+
+    async def ensure_users(self):
+        if not self.users:
+            await self.register_storm()
+
+    async def register_storm(self) -> dict:
+        """N users register at once (bcrypt hashing under load)"""
+        offset = len(self.users)
+        emails = [f"user{offset + i}@example.com" for i in range(self.args.users)]
+        responses = {}
+
+        def register(email):
+            async def call():
+                response = await self.client.post("/api/auth/register", {
+                    "username": email.split("@")[0], "email": email, "password": "benchmark"
+                })
+                responses[email] = response
+                return response
+            return call
+
+        result = await run_load([register(e) for e in emails], self.args.concurrency)
+        for email in emails:
+            response = responses.get(email)
+            if response is not None and response.status == 201:
+                token = response.json()["access_token"]
+                self.users.append((email, {"Authorization": f"Bearer {token}"}))
+        return result
+
+    async def login_storm(self) -> dict:
+        """Every registered user logs in (bcrypt verification under load)"""
+        await self.ensure_users()
+
+        def login(email):
+            return lambda: self.client.post("/api/auth/login", {"email": email, "password": "benchmark"})
+
+        return await run_load([login(email) for email, _ in self.users], self.args.concurrency)
+
+    async def crud_mix(self) -> dict:
+        """N users x M todos, then a read-heavy mix of all todo routes"""
+        await self.ensure_users()
+
+        # Seed M todos per user through the batch endpoint (not measured)
+        owned = {}
+        for email, headers in self.users:
+            operations = [{"op": "create", "title": f"Todo {i}"} for i in range(self.args.todos)]
+            ids = []
+            for start in range(0, len(operations), 1000):
+                response = await self.client.post(
+                    "/api/todos/batch", {"operations": operations[start:start + 1000]}, headers=headers
+                )
+                ids += [r["todo"]["id"] for r in response.json()["results"]]
+            owned[email] = ids
+
+        rng = self.rng
+        mix = [
+            ("list", 40), ("get", 25), ("update", 10), ("toggle", 10), ("create", 10), ("delete", 5)
+        ]
+        kinds = [kind for kind, weight in mix for _ in range(weight)]
+
+        def make_call():
+            email, headers = rng.choice(self.users)
+            ids = owned[email]
+            kind = rng.choice(kinds) if ids else "create"
+            if kind == "list":
+                return lambda: self.client.get("/api/todos?limit=50", headers=headers)
+            if kind == "create":
+                return lambda: self.client.post("/api/todos", {"title": "New todo"}, headers=headers)
+            todo_id = rng.choice(ids)
+            if kind == "get":
+                return lambda: self.client.get(f"/api/todos/{todo_id}", headers=headers)
+            if kind == "update":
+                return lambda: self.client.put(f"/api/todos/{todo_id}", {"title": "Renamed"}, headers=headers)
+            if kind == "toggle":
+                return lambda: self.client.patch(f"/api/todos/{todo_id}/toggle", headers=headers)
+            ids.remove(todo_id)
+            return lambda: self.client.delete(f"/api/todos/{todo_id}", headers=headers)
+
+        calls = [make_call() for _ in range(self.args.requests)]
+        return await run_load(calls, self.args.concurrency)
+
+
+# ============================================
+# ML API SCENARIOS
+# ============================================
+
+class MLScenarios:
+    """Prediction traffic against the ML API"""
+
+    def __init__(self, app_module, args):
+        self.client = ASGIClient(app_module.app)
+        self.args = args
+
+    async def predict_single(self) -> dict:
+        """One sample per request"""
+        calls = [
+            (lambda sample=IRIS_SAMPLES[i % len(IRIS_SAMPLES)]: self.client.post("/predict", sample))
+            for i in range(self.args.requests)
+        ]
+        return await run_load(calls, self.args.concurrency)
+
+    async def predict_batch(self) -> dict:
+        """`--batch-size` samples per request"""
+        body = {"samples": [IRIS_SAMPLES[i % len(IRIS_SAMPLES)] for i in range(self.args.batch_size)]}
+        calls = [lambda: self.client.post("/predict/batch", body)] * self.args.batch_requests
+        return await run_load(calls, self.args.concurrency)
+
+
+# ============================================
+# RUNNER
+# ============================================
+
+SCENARIOS = [
+    "todo.register_storm",
+    "todo.login_storm",
+    "todo.crud_mix",
+    "ml.predict_single",
+    "ml.predict_batch",
+]
+
+
+async def run_scenarios(names, args) -> dict:
+    results = {}
+    todo = ml = None
+
+    for name in names:
+        app_name, scenario = name.split(".", 1)
+        if app_name == "todo" and todo is None:
+            todo = TodoScenarios(load_example("phase3-backend/02_fastapi_basics.py", "todo_api"), args)
+        if app_name == "ml" and ml is None:
+            ml = MLScenarios(load_example("phase6-ml/02_ml_web_integration.py", "ml_api"), args)
+        runner = getattr(todo if app_name == "todo" else ml, scenario)
+
+        print(f"running {name} ...", flush=True)
+        if args.tracemalloc:
+            tracemalloc.start()
+        result = await runner()
+        if args.tracemalloc:
+            result["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        result["peak_rss_mb"] = peak_rss_mb()
+        results[name] = result
+
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Rows comparing two runs; a row is a regression if p95 or rps got worse by > threshold %"""
+    rows = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        p95_change = (now["p95_us"] / before["p95_us"] - 1) * 100 if before["p95_us"] else 0.0
+        rps_change = (now["ops_per_sec"] / before["ops_per_sec"] - 1) * 100 if before["ops_per_sec"] else 0.0
+        regression = p95_change > threshold or rps_change < -threshold
+        rows.append({
+            "scenario": name,
+            "p95_change_pct": p95_change,
+            "rps_change_pct": rps_change,
+            "status": "REGRESSION" if regression else "ok",
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="run only these (repeatable)")
+    parser.add_argument("--users", type=int, default=20, help="users to register (N)")
+    parser.add_argument("--todos", type=int, default=200, help="todos per user for crud_mix (M)")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--batch-size", type=int, default=100, help="samples per /predict/batch request")
+    parser.add_argument("--batch-requests", type=int, default=50, help="requests for ml.predict_batch")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent virtual clients")
+    parser.add_argument("--todo-store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peak (slower)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    # Per-request INFO logs would dominate the measurement
+    logging.disable(logging.INFO)
+
+    # The ML example writes its model files to the working directory
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.chdir(workdir)
+    os.environ["TODO_STORE"] = args.todo_store
+    os.environ["TODO_DB_PATH"] = os.path.join(workdir, "todos.db")
+    # Every virtual client shares one address, so the auth storms would
+    # mostly measure 429s from the per-IP login/register limit
+    os.environ.setdefault("AUTH_RATE_LIMIT", "0")
+    # ml.predict_single repeats three samples: measure the model, not cache hits
+    os.environ.setdefault("ML_PREDICTION_CACHE_SIZE", "0")
+
+    results = asyncio.run(run_scenarios(args.scenario or SCENARIOS, args))
+
+    rows = [{"scenario": name, **result} for name, result in results.items()]
+    print_table(
+        "Results (latency in microseconds)",
+        rows,
+        ["scenario", "ops", "errors", "ops_per_sec", "p50_us", "p95_us", "p99_us", "peak_rss_mb"],
+    )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+        comparison = compare(results, baseline, args.threshold)
+        print_table(f"Compared with {baseline_path} (threshold {args.threshold}%)", comparison,
+                    ["scenario", "p95_change_pct", "rps_change_pct", "status"])
+        if any(row["status"] == "REGRESSION" for row in comparison):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()